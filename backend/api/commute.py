@@ -3,29 +3,34 @@
 """
 from __future__ import annotations
 import hashlib, datetime as _dt
-from pathlib import Path
 from flask import Blueprint, request, jsonify
 import requests
 
-from config import ROUTE_DIR, ROUTE_TTL_H
+from config import ROUTE_TTL_H
 from util import cache as c
-from geo_utils import GEOAPIFY_KEY
+from util import quota
+from geo_utils import GEOAPIFY_KEY, CROWFLY_KMH, haversine_km
 
 bp = Blueprint("commute", __name__, url_prefix="/api")
 
-def _route_cache_path(key: str) -> Path:
-    return ROUTE_DIR / f"{key}.json"
-
 def _load_route_cache(key: str):
-    fn = _route_cache_path(key)
-    if not fn.exists():
-        return None
-    meta = c.load(key, ROUTE_TTL_H)       # reuse util.cache but different store
-    return meta
+    return c.load(key, ROUTE_TTL_H)        # reuse util.cache store
 
 def _save_route_cache(key: str, geojson: dict):
     c.save(key, geojson)                   # util.cache handles ttl / purge
 
+def _crowfly_route(olat, olon, dlat, dlon, mode):
+    """Straight-line estimate used while Geoapify is rate limiting us."""
+    km = float(haversine_km(olat, olon, dlat, dlon))
+    kmh = CROWFLY_KMH.get(mode, CROWFLY_KMH["drive"])
+    return {"type": "FeatureCollection", "estimated": True, "features": [{
+        "type": "Feature",
+        "geometry": {"type": "LineString",
+                     "coordinates": [[olon, olat], [dlon, dlat]]},
+        "properties": {"mode": mode, "distance": round(km * 1000),
+                       "time": round(km / kmh * 3600), "estimated": True},
+    }]}
+
 def _fetch_route(olat, olon, dlat, dlon, pref_mode):
     modes = (
         [pref_mode, "walk", "approximated_transit"]
@@ -33,6 +38,11 @@ def _fetch_route(olat, olon, dlat, dlon, pref_mode):
         else [pref_mode, "approximated_transit", "walk"]
     )
     for mode in modes:
+        try:
+            quota.acquire("routing")
+        except quota.QuotaExceeded as exc:
+            print(f"[Route] {exc} – straight-line estimate")
+            return _crowfly_route(olat, olon, dlat, dlon, pref_mode)
         try:
             r = requests.get(
                 "https://api.geoapify.com/v1/routing",
@@ -46,6 +56,11 @@ def _fetch_route(olat, olon, dlat, dlon, pref_mode):
                 timeout=20,
                 headers={"User-Agent": "CommuteFinder/3.6"},
             )
+            quota.report("routing", r.status_code, r.headers.get("Retry-After"))
+            if r.status_code in (403, 429):
+                # same key fails for every mode – don't burn more quota
+                print(f"[Route] HTTP {r.status_code} – straight-line estimate")
+                return _crowfly_route(olat, olon, dlat, dlon, pref_mode)
             r.raise_for_status()
             js = r.json()
             if js.get("features"):
@@ -78,7 +93,7 @@ def routes():                              # noqa: C901 – a bit long, but clea
         geo = _load_route_cache(cache_key)
         if geo is None:
             geo = _fetch_route(olat, olon, dlat, dlon, mode)
-            if geo:
+            if geo and not geo.get("estimated"):
                 _save_route_cache(cache_key, geo)
 
         if not geo or not geo.get("features"):
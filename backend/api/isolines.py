@@ -2,14 +2,11 @@
 /api/isolines – build commute-time polygons & stash the exact intersection
 """
 from __future__ import annotations
-import hashlib, datetime as _dt
 from flask import Blueprint, request, jsonify
-from shapely.geometry import shape, MultiPolygon, mapping
-from shapely import wkb
+from shapely.geometry import mapping
 
-from config import POLY_STORE
-from util.polygon import build_polylocation_param
-from geo_utils import fetch_isoline, geocode_address
+from util import http as h
+import search as s
 
 bp = Blueprint("isolines", __name__, url_prefix="/api")
 
@@ -17,48 +14,30 @@ bp = Blueprint("isolines", __name__, url_prefix="/api")
 def isolines() -> tuple:
     data        = request.get_json(force=True) or {}
     locations   = data.get("locations", [])
-    features, modes = [], set()
-
-    intersection = None
-    for idx, loc in enumerate(locations):
-        minutes = int(loc.get("time", 15))
-        mode    = loc.get("mode", "transit")
-
-        lat, lon = (
-            (loc["lat"], loc["lon"])
-            if "lat" in loc else
-            geocode_address(f'{loc.get("address","")}, Norway') or (None, None)
-        )
-        if lat is None:
-            continue
-
-        fc = fetch_isoline(lat, lon, minutes, mode)
-        if not fc.get("features"):
-            continue
-        for f in fc["features"]:
-            f.setdefault("properties", {}).update(locId=idx, mode=mode)
-
-        features.extend(fc["features"])
-        modes.add(mode)
-
-        poly = shape(fc["features"][0]["geometry"])
-        intersection = poly if intersection is None else intersection.intersection(poly)
-
-    if not (features and intersection and not intersection.is_empty):
+    geom_enc    = data.get("geometry", "geojson")      # "geojson" | "polyline"
+    try:
+        precision = h.parse_precision(data.get("precision"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "precision must be an integer"}), 400
+    if geom_enc not in h.GEOMETRY_ENCODINGS:
+        return jsonify({"error": f"geometry must be one of {list(h.GEOMETRY_ENCODINGS)}"}), 400
+
+    area = s.commute_area(locations)
+    if area is None:
         return jsonify({"error": "Could not build commute area"}), 400
 
-    simple = intersection.convex_hull if isinstance(intersection, MultiPolygon) else intersection
-    poly_param = build_polylocation_param(simple)
-
-    # write full precision WKB for later point-in-polygon tests
-    token = hashlib.sha1(poly_param.encode()).hexdigest()
-    (POLY_STORE / f"{token}.wkb").write_bytes(intersection.wkb)
-
     # light debug layers for the map in the UI
-    features.append({"type": "Feature", "geometry": mapping(intersection),
-                     "properties": {"intersection": True}})
-    features.append({"type": "Feature", "geometry": mapping(simple),
-                     "properties": {"query": True}})
-
-    payload = {"type": "FeatureCollection", "features": features, "token": token}
-    return jsonify(payload), 200
+    features = area.features + [
+        {"type": "Feature", "geometry": mapping(area.intersection),
+         "properties": {"intersection": True}},
+        {"type": "Feature", "geometry": mapping(area.simple),
+         "properties": {"query": True}},
+    ]
+
+    # POSTs are never revalidated – compress, but no ETag / 304 here
+    payload = {
+        "type":     "FeatureCollection",
+        "features": h.compact_features(features, precision, geom_enc),
+        "token":    area.token,
+    }
+    return h.json_response(payload)
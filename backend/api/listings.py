@@ -1,100 +1,84 @@
 """
 /api/listings – query FINN for ads within the stored polygon,
 apply post-filters and return matches.
+
+Without `limit` the full (optionally sorted) array is returned as before.
+With `limit` the filtered result is kept server-side as a result set and
+served as `{items, total, next_cursor}` pages; follow-up pages only need
+`?cursor=…`.  `view=markers` trims rows to id/lat/lon/price for the map.
 """
 from __future__ import annotations
-import hashlib, time
-from pathlib import Path
-from typing import Iterable, Set
 from flask import Blueprint, request, jsonify
-from shapely.geometry import Point
-from shapely.prepared import prep
-from shapely import wkb
 
-from config import POLY_STORE, LISTING_TTL_H
-from util import cache as c
-from util.polygon import build_polylocation_param
-from finn_scraper import scrape_listings_polygon
-from geo_utils import geocode_address
+from util import http as h
+from util import resultset as rset
+import search as s
 
 bp = Blueprint("listings", __name__, url_prefix="/api")
 
-def _parse_csv_list(raw: str) -> Set[str]:
-    return {v.strip().lower() for v in raw.split(",") if v.strip()}
+def _next_page(cursor: str):
+    try:
+        rs_key, sort, desc, offset, limit, view = rset.decode_cursor(cursor)
+    except ValueError:
+        return jsonify({"error": "bad cursor"}), 400
+
+    if (hit := rset.load(rs_key)) is None:
+        return jsonify({"error": "result set expired"}), 410
+    rs, complete = hit
+    etag = h.make_etag(cursor) if complete else None
+    if etag and (resp := h.not_modified(etag)):
+        return resp
+    body = rset.page(rs, rs_key, sort=sort, desc=desc,
+                     offset=offset, limit=limit, view=view)
+    return h.json_response(body, etag=etag)
 
 @bp.get("/listings")
 def listings() -> tuple:
+    if (cursor := request.args.get("cursor", "").strip()):
+        return _next_page(cursor)
+
     token = request.args.get("token", "").strip()
     if not token:
         return jsonify({"error": "token missing"}), 400
 
-    poly_fp = POLY_STORE / f"{token}.wkb"
-    if not poly_fp.exists():
+    geom = s.load_polygon(token)
+    if geom is None:
         return jsonify({"error": "invalid token"}), 400
 
-    geom           = wkb.loads(poly_fp.read_bytes())
-    prepared_union = prep(geom)
-    poly_param     = build_polylocation_param(geom)
-
     # ---------- URL params ---------------------------------------------------
-    rent_min  = int(request.args.get("rent_min", 0) or 0)
-    rent_max  = int(request.args.get("rent_max", 0) or 9_999_999)
-    size_min  = int(request.args.get("size_min", 0) or 0)
-    size_max  = int(request.args.get("size_max", 0) or 0)
-    bed_min   = int(request.args.get("min_bedrooms", 0) or 0)
-    listing_mode = request.args.get("mode", "rent").lower()
-
-    type_list     = _parse_csv_list(request.args.get("boligtype", ""))
-    facility_list = _parse_csv_list(request.args.get("facilities", ""))
-    floor_list    = _parse_csv_list(request.args.get("floor", ""))
+    filters = s.Filters.parse(request.args.get)
 
-    # ---------- cache signature ---------------------------------------------
-    sig_parts: Iterable[str] = (
-        poly_param, str(rent_min), str(rent_max), str(size_min), str(size_max),
-        str(bed_min), ",".join(sorted(type_list)), ",".join(sorted(facility_list)),
-        ",".join(sorted(floor_list)), listing_mode,
-    )
-    cache_key = hashlib.sha1("|".join(sig_parts).encode()).hexdigest()
-    cache_fp  = c.cache_path(cache_key)
+    sort  = request.args.get("sort") or None
+    desc  = request.args.get("order", "asc").lower() == "desc"
+    view  = request.args.get("view", "full").lower()
+    limit = request.args.get("limit")
+    if sort is not None and sort not in rset.SORT_KEYS:
+        return jsonify({"error": f"sort must be one of {sorted(rset.SORT_KEYS)}"}), 400
+    if view not in rset.VIEWS:
+        return jsonify({"error": f"view must be one of {list(rset.VIEWS)}"}), 400
+    if limit is not None:
+        try:
+            limit = int(limit or 100)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return jsonify({"error": "limit must be a positive integer"}), 400
 
     # ---------- load / scrape ------------------------------------------------
-    with c.with_lock(cache_fp):
-        raw = c.load(cache_key, LISTING_TTL_H)
-        if raw is None:
-            raw = scrape_listings_polygon(
-                poly_param,
-                rent_min or None,
-                rent_max,
-                listing_mode=listing_mode,
-                property_types=type_list,
-                facilities=facility_list,
-                floors=floor_list,
-                area_from=size_min or None,
-                area_to=size_max or None,
-                bedrooms_min=bed_min or None,
-            )
-            c.save(cache_key, raw)
-
-    # ---------- post-filter & geocode ---------------------------------------
-    inside, gcache = [], {}
-    t0 = time.perf_counter()
-    for ad in raw:
-        price = ad.get("price") or 0
-        if not (rent_min <= price <= rent_max):
-            continue
-        size = ad.get("size") or 0
-        if (size_min and size < size_min) or (size_max and size > size_max):
-            continue
+    cache_key, cols = s.scrape(geom, filters)
 
-        addr = f"{ad['address']}, Norway"
-        gcache.setdefault(addr, geocode_address(addr))
-        coords = gcache[addr]
-        if not coords:
-            continue
-        lat, lon = coords
-        if prepared_union.contains(Point(lon, lat)):
-            ad.update(lat=lat, lon=lon)
-            inside.append(ad)
+    # same token + same scrape on disk → same answer, skip geocode & filter
+    rs_key = s.result_set_key(token, cache_key)
+    etag   = h.make_etag(rs_key, sort, desc, view, limit)
+    if (resp := h.not_modified(etag)):
+        return resp
 
-    print(f"[Filter] inside={len(inside)}  {time.perf_counter()-t0:0.1f}s")
-    return jsonify(inside), 200
+    rs, complete = s.result_set(rs_key, token, geom, filters, cols)
+    if not complete:
+        etag = None                   # partial – must not be revalidated as-is
+    if limit is None:
+        body = rset.project(rs, rset.ordered(rs, sort, desc), view)
+    else:
+        body = rset.page(rs, rs_key, sort=sort, desc=desc,
+                         limit=limit, view=view)
+    return h.json_response(body, etag=etag)
@@ -0,0 +1,15 @@
+"""
+/api/quota – Geoapify credits spent in the current window & breaker state
+"""
+from __future__ import annotations
+from flask import Blueprint, jsonify
+from util import quota
+
+bp = Blueprint("quota", __name__, url_prefix="/api")
+
+@bp.get("/quota")
+def usage() -> tuple:
+    try:
+        return jsonify(quota.usage()), 200
+    except quota.QuotaExceeded as exc:
+        return jsonify({"error": str(exc)}), 503
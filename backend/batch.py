@@ -0,0 +1,145 @@
+# backend/batch.py
+"""
+Headless batch search – run many commute/price scenarios in parallel.
+
+    python batch.py specs.jsonl -o sweep.parquet -j 8
+
+*specs* is JSON Lines (one spec per line) or a JSON array.  A spec holds the
+same fields the UI sends – `locations` as for /api/isolines, filters as the
+/api/listings query params – plus an optional `name`:
+
+    {"name": "oslo-rent", "mode": "rent", "rent_max": 18000,
+     "boligtype": ["leilighet"], "locations": [
+        {"address": "Karl Johans gate 1, Oslo", "time": 20, "mode": "transit"}]}
+
+Each spec runs isolines → scrape → geocode → filter in its own process;
+the on-disk caches (listings, isolines, geocodes, quota) are lock-guarded,
+so specs sharing an area reuse each other's work.  Listings of all specs go
+to *out* (`.parquet` needs pyarrow, anything else is CSV) with a `spec`
+column; per-spec stage timings go next to it as `<out>.timings.<ext>`.
+Geocoding shares one Nominatim slot across all processes (config
+NOMINATIM_MIN_DELAY_S), so -j scales scraping and filtering, not geocodes.
+"""
+from __future__ import annotations
+import argparse, csv, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import search as s
+
+TIMING_FIELDS = ("spec", "status", "listings",
+                 "isolines_s", "scrape_s", "filter_s", "total_s", "error")
+
+# ───────────────────────────────── worker ───────────────────────────────────
+def run_spec(spec: dict) -> tuple[dict, dict[str, list]]:
+    """Run one spec end to end → (timing row, listing columns)."""
+    timing = dict.fromkeys(TIMING_FIELDS)
+    timing.update(spec=spec["name"], status="ok", listings=0)
+    cols: dict[str, list] = {}
+    t0 = t = time.perf_counter()
+
+    def lap(stage: str) -> None:
+        nonlocal t
+        now = time.perf_counter()
+        timing[f"{stage}_s"] = round(now - t, 3)
+        t = now
+
+    try:
+        area = s.commute_area(spec.get("locations", []))
+        lap("isolines")
+        if area is None:
+            raise ValueError("could not build commute area")
+
+        filters = s.Filters.parse(spec.get)
+        cache_key, raw = s.scrape(area.intersection, filters)
+        lap("scrape")
+
+        rs_key = s.result_set_key(area.token, cache_key)
+        rs, _ = s.result_set(rs_key, area.token, area.intersection, filters, raw)
+        lap("filter")
+
+        cols = rs.columns()
+        timing["listings"] = len(rs)
+    except Exception as exc:                   # one bad spec must not sink the sweep
+        timing.update(status="error", error=f"{type(exc).__name__}: {exc}")
+    timing["total_s"] = round(time.perf_counter() - t0, 3)
+    return timing, cols
+
+# ───────────────────────────────── io ───────────────────────────────────────
+def load_specs(path: Path) -> list[dict]:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".jsonl":
+        specs = [json.loads(ln) for ln in text.splitlines() if ln.strip()]
+    else:
+        specs = json.loads(text)
+        specs = specs.get("specs", []) if isinstance(specs, dict) else specs
+    for i, spec in enumerate(specs):
+        spec.setdefault("name", f"spec{i}")
+    return specs
+
+def _concat(parts: list[tuple[str, dict[str, list]]]) -> dict[str, list]:
+    fields: dict[str, None] = {"spec": None}
+    for _, cols in parts:
+        fields.update(dict.fromkeys(cols))
+    out: dict[str, list] = {f: [] for f in fields}
+    for name, cols in parts:
+        n = len(next(iter(cols.values()), []))
+        out["spec"].extend([name] * n)
+        for f in fields:
+            if f != "spec":
+                out[f].extend(cols.get(f, [None] * n))
+    return out
+
+def write_table(cols: dict[str, list], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".parquet":
+        import pyarrow as pa, pyarrow.parquet as pq
+        pq.write_table(pa.table(cols), path)
+        return
+    with path.open("w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh)
+        w.writerow(cols)
+        w.writerows(zip(*cols.values()))
+
+# ───────────────────────────────── cli ──────────────────────────────────────
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("specs", type=Path, help="JSON / JSON Lines file of search specs")
+    ap.add_argument("-o", "--out", type=Path, default=Path("batch_results.csv"),
+                    help="listings output (.parquet or .csv)")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                    help="worker processes (default: all cores)")
+    args = ap.parse_args(argv)
+
+    if args.out.suffix == ".parquet":
+        try:
+            import pyarrow  # noqa: F401 – fail before the sweep, not after
+        except ImportError:
+            print("[Batch] .parquet output needs pyarrow – pip install pyarrow",
+                  file=sys.stderr)
+            return 2
+
+    specs = load_specs(args.specs)
+    print(f"[Batch] {len(specs)} spec(s) on {args.jobs} worker(s)")
+
+    results: dict[int, tuple[dict, dict]] = {}
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futs = {pool.submit(run_spec, spec): i for i, spec in enumerate(specs)}
+        for fut in as_completed(futs):
+            timing, cols = results.setdefault(futs[fut], fut.result())
+            print(f"[Batch] {timing['spec']}: {timing['status']} "
+                  f"{timing['listings']} listings {timing['total_s']:.1f}s")
+
+    ordered = [results[i] for i in range(len(specs))]
+    write_table(_concat([(t["spec"], cols) for t, cols in ordered]), args.out)
+    timings_fp = args.out.with_suffix(f".timings{args.out.suffix}")
+    write_table({f: [t[f] for t, _ in ordered] for f in TIMING_FIELDS}, timings_fp)
+
+    failed = sum(t["status"] != "ok" for t, _ in ordered)
+    print(f"[Batch] done in {time.perf_counter()-t0:0.1f}s → {args.out}, "
+          f"{timings_fp}  ({failed} failed)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,5 +20,25 @@ LOCK_TIMEOUT_SEC = 570
 
 #: how long listings / routes stay fresh on disk
 LISTING_TTL_H   = 72
+#: result sets with addresses that failed to geocode – retry soon
+PARTIAL_RS_TTL_H = 0.25
 ROUTE_TTL_H     = 24
 CACHE_PURGE_D   = 7
+
+#: Nominatim usage policy: at most one request per second, across every
+#: process on this host (gunicorn workers and batch jobs share the slot)
+NOMINATIM_MIN_DELAY_S = 1.0
+
+#: isoline ranges per origin+mode stay on disk this long
+ISOLINE_TTL_H   = 168
+
+#: Geoapify spend control – credits per call and per rolling window
+#: (free tier is 3000 credits/day; override the budget via env)
+GEOAPIFY_CREDITS  = {"isoline": 1, "routing": 1}
+GEOAPIFY_BUDGET   = int(os.getenv("GEOAPIFY_BUDGET", "3000"))
+QUOTA_WINDOW_H    = 24
+QUOTA_FILE        = CACHE_DIR / "quota.state"     # not *.json – cache purge skips it
+
+#: circuit breaker after 403/429 – first cool-down, doubled up to the max
+BREAKER_COOLDOWN_S     = 60
+BREAKER_MAX_COOLDOWN_S = 900
@@ -17,6 +17,7 @@ LIST_RX  = re.compile(r"/realestate/(lettings|homes)/ad\.html\?finnkode=")
 PRICE_RX = re.compile(r"(\d[\d\s\u00A0]*kr)")
 SIZE_RX  = re.compile(r"(\d+)\s*m²")
 DIGITS   = re.compile(r"[^\d]")
+CODE_RX  = re.compile(r"finnkode=(\d+)")
 
 # ───────────────────────────────── helpers ──────────────────────────────────
 def _parse(article) -> Dict:
@@ -57,6 +58,11 @@ def _parse(article) -> Dict:
     }
 
 # ───────────────────────────── public api ───────────────────────────────────
+def finnkode_from_url(url: str | None) -> str | None:
+    """FINN's ad id – stable across searches, so it doubles as our key."""
+    m = CODE_RX.search(url or "")
+    return m.group(1) if m else None
+
 def scrape_listings_polygon(
     polylocation: str,
     price_min: int | None,
@@ -1,23 +1,38 @@
 #geo_utils.py
 import datetime
+import hashlib
 import shelve
-from functools import lru_cache
+import time
+from functools import lru_cache, wraps
 from typing import List, Optional, Tuple
 
 import os
+import numpy as np
 import requests
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
-from shapely.geometry import Point, shape
+from shapely.affinity import affine_transform
+from shapely.geometry import Point, mapping, shape
 from filelock import FileLock
 import shelve, dbm, pathlib
 
+from config import (CACHE_DIR, ISOLINE_TTL_H, NOMINATIM_MIN_DELAY_S,
+                    PARTIAL_RS_TTL_H)
+from util import cache as c
+from util import quota
+
 # ─── Geoapify key ────────────────────────────────────────────────────────────
 GEOAPIFY_KEY = os.getenv("GEOAPIFY_KEY", "").strip()
 
 # ─── transport modes allowed ─────────────────────────────────────────────────
 ALLOWED_MODES = {"drive", "bicycle", "walk", "transit", "approximated_transit"}
 
+#: effective straight-line speeds (detours included) for degraded estimates
+CROWFLY_KMH = {
+    "walk": 4.5, "bicycle": 13.0, "drive": 35.0,
+    "transit": 20.0, "approximated_transit": 20.0,
+}
+
 # ─── Nominatim pools (2×0.5 s delay) ─────────────────────────────────────────
 geoA = Nominatim(user_agent="CommuteFinder/3A", timeout=5)
 geoB = Nominatim(user_agent="CommuteFinder/3B", timeout=5)
@@ -26,6 +41,23 @@ limB = RateLimiter(geoB.geocode, min_delay_seconds=0.5)
 revA = RateLimiter(geoA.reverse, min_delay_seconds=0.5)
 revB = RateLimiter(geoB.reverse, min_delay_seconds=0.5)
 
+# one shared slot for *all* processes (gunicorn workers, batch jobs) – the
+# RateLimiters above only pace a single process
+NOMINATIM_SLOT = CACHE_DIR / "nominatim.next"
+_SLOT_LOCK     = FileLock(str(NOMINATIM_SLOT) + ".lock", timeout=30)
+
+def _nominatim_slot() -> None:
+    """Reserve the next global Nominatim slot and sleep until it is due."""
+    with _SLOT_LOCK:
+        try:
+            due = float(NOMINATIM_SLOT.read_text())
+        except (OSError, ValueError):
+            due = 0.0
+        now = time.time()
+        NOMINATIM_SLOT.write_text(str(max(now, due) + NOMINATIM_MIN_DELAY_S))
+    if due > now:
+        time.sleep(due - now)
+
 def _pick(addr: str):
     return limA if hash(addr) & 1 == 0 else limB
 
@@ -36,6 +68,8 @@ def _pick_rev(lat: float):
 CACHE_DB   = pathlib.Path(__file__).with_name("geocode_cache.db")
 CACHE_LOCK = FileLock(str(CACHE_DB) + ".lock")
 TTL = datetime.timedelta(hours=24)
+#: negative entries – short, so partial result sets retry them on rebuild
+MISS_TTL = datetime.timedelta(hours=PARTIAL_RS_TTL_H)
 
 def _open_cache(flag: str = "r"):
     try:
@@ -48,10 +82,24 @@ def _open_cache(flag: str = "r"):
                 return shelve.open(str(CACHE_DB), flag="c", writeback=False)
         raise
 
+def _locked(fn):
+    """
+    Hold CACHE_LOCK for the whole shelve round-trip, not just the open –
+    dbm files must not be read while another process (gunicorn worker or
+    batch job) is writing them.  FileLock is re-entrant, _open_cache nests.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with CACHE_LOCK:
+            return fn(*args, **kwargs)
+    return wrapper
+
+@_locked
 def _get_cached(address: str):
     """
     Return (lat, lon) from the on-disk shelve if the entry is still fresh,
-    otherwise delete the stale record and return None.
+    otherwise delete the stale record and return None.  A fresh negative
+    entry (Nominatim had no result) comes back as (None, None).
     """
     # ---------- 1) try read-only ----------------------
     db = _open_cache("r")
@@ -62,7 +110,7 @@ def _get_cached(address: str):
 
         lat, lon, ts = rec
         ts = datetime.datetime.fromisoformat(ts)
-        if datetime.datetime.utcnow() - ts < TTL:
+        if datetime.datetime.utcnow() - ts < (TTL if lat is not None else MISS_TTL):
             return (lat, lon)
     finally:
         db.close()
@@ -77,7 +125,8 @@ def _get_cached(address: str):
         db.close()
     return None
 
-def _set_cached(address: str, lat: float, lon: float):
+@_locked
+def _set_cached(address: str, lat: Optional[float], lon: Optional[float]):
     with _open_cache("w") as db:
         db[address] = (
             lat,
@@ -86,26 +135,44 @@ def _set_cached(address: str, lat: float, lon: float):
         )
         db.sync()
 
+class _GeocodeMiss(Exception):
+    """Raised instead of returning None so lru_cache never memoizes a miss."""
+
 @lru_cache(maxsize=4096)
-def geocode_address(address: str) -> Optional[Tuple[float, float]]:
-    # 1) try disk cache
+def _geocode_hit(address: str) -> Tuple[float, float]:
+    # 1) try disk cache (hits and recent "no result" answers)
     cached = _get_cached(address)
     if cached:
+        if cached[0] is None:
+            raise _GeocodeMiss(address)
         return cached
     # 2) fetch from Nominatim
     try:
+        _nominatim_slot()
         loc = _pick(address)(address, country_codes="no", exactly_one=True)
-        if loc:
-            lat, lon = loc.latitude, loc.longitude
-            _set_cached(address, lat, lon)
-            return (lat, lon)
+    except Exception:
+        raise _GeocodeMiss(address)        # transient – retry on the next call
+    lat, lon = (loc.latitude, loc.longitude) if loc else (None, None)
+    try:
+        _set_cached(address, lat, lon)     # a real miss is remembered briefly
     except Exception:
         pass
-    return None
+    if lat is None:
+        raise _GeocodeMiss(address)
+    return (lat, lon)
+
+def geocode_address(address: str) -> Optional[Tuple[float, float]]:
+    # misses never enter lru_cache: transient errors retry right away,
+    # "no result" answers are re-asked once their MISS_TTL shelve entry expires
+    try:
+        return _geocode_hit(address)
+    except _GeocodeMiss:
+        return None
 
 @lru_cache(maxsize=4096)
 def reverse_geocode(lat: float, lon: float) -> Optional[str]:
     try:
+        _nominatim_slot()
         loc = _pick_rev(lat)((lat, lon), exactly_one=True, language="en")
         if loc:
             return loc.address
@@ -114,11 +181,52 @@ def reverse_geocode(lat: float, lon: float) -> Optional[str]:
     return None
 
 # ─── isoline helper (Geoapify) ───────────────────────────────────────────────
+def _isoline_key(lat: float, lon: float, mode: str) -> str:
+    return hashlib.sha1(f"iso:{lat:.5f},{lon:.5f}@{mode}".encode()).hexdigest()
+
+def _empty_fc() -> dict:
+    return {"type": "FeatureCollection", "features": []}
+
+def crowfly_isoline(lat: float, lon: float, minutes: int, mode: str) -> dict:
+    """Coarse stand-in: a circle reachable at the mode's straight-line speed."""
+    r_km = CROWFLY_KMH.get(mode, CROWFLY_KMH["drive"]) * minutes / 60
+    sx   = r_km / (111.32 * np.cos(np.radians(lat)))
+    sy   = r_km / 110.57
+    circle = affine_transform(Point(0, 0).buffer(1, 16), [sx, 0, 0, sy, lon, lat])
+    return {"type": "FeatureCollection", "features": [{
+        "type": "Feature", "geometry": mapping(circle),
+        "properties": {"range": minutes * 60, "mode": mode, "degraded": "crowfly"},
+    }]}
+
+def _degraded_isoline(lat, lon, minutes: int, mode: str, ranges: dict) -> dict:
+    # nearest cached range for the same origin beats a synthetic circle
+    if ranges:
+        near = min(ranges, key=lambda m: abs(int(m) - minutes))
+        print(f"[Iso] degraded → cached {near} min instead of {minutes}")
+        fc = ranges[near]
+        return {**fc, "features": [
+            {**f, "properties": {**f.get("properties", {}), "degraded": "cached_range"}}
+            for f in fc["features"]
+        ]}
+    print(f"[Iso] degraded → crow-fly circle for {minutes} min {mode}")
+    return crowfly_isoline(lat, lon, minutes, mode)
+
 def fetch_isoline(lat: float, lon: float, minutes: int, mode: str) -> dict:
     if mode == "transit":
         mode = "approximated_transit"
     mode = mode if mode in ALLOWED_MODES else "drive"
 
+    key    = _isoline_key(lat, lon, mode)
+    ranges = c.load(key, ISOLINE_TTL_H) or {}
+    if str(minutes) in ranges:
+        return ranges[str(minutes)]
+
+    try:
+        quota.acquire("isoline")
+    except quota.QuotaExceeded as exc:
+        print(f"[Iso] {exc}")
+        return _degraded_isoline(lat, lon, minutes, mode, ranges)
+
     params = {
         "lat": lat, "lon": lon, "type": "time",
         "range": minutes * 60, "mode": mode,
@@ -131,17 +239,36 @@ def fetch_isoline(lat: float, lon: float, minutes: int, mode: str) -> dict:
     try:
         r = requests.get(url, params=params, timeout=25,
                          headers={"User-Agent": "CommuteFinder/3.4"})
+        quota.report("isoline", r.status_code, r.headers.get("Retry-After"))
         r.raise_for_status()
         js = r.json()
         if not js.get("features"):
             print("[Iso] Geoapify 200 but empty. First bytes:", r.text[:200])
+            return js
+        with c.with_lock(c.cache_path(key)):
+            ranges = c.load(key, ISOLINE_TTL_H) or {}
+            ranges[str(minutes)] = js
+            c.save(key, ranges)
         return js
     except requests.HTTPError as e:
         st = r.status_code
         print(f"[Iso] HTTP {st} – {'quota' if st in (403,429) else e}")
+        if st in (403, 429):
+            return _degraded_isoline(lat, lon, minutes, mode, ranges)
     except Exception as e:
         print(f"[Iso] EXC – {e}")
-    return {"type": "FeatureCollection", "features": []}
+    return _empty_fc()
+
+# ─── distance helpers ────────────────────────────────────────────────────────
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km – plenty precise at city scale.
+    Works on scalars and element-wise on NumPy arrays alike.
+    """
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dp, dl = p2 - p1, np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(a))
 
 # ─── shapely helpers ─────────────────────────────────────────────────────────
 def polygons_from_featurecollection(fc: dict) -> List:
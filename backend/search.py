@@ -0,0 +1,201 @@
+"""
+Search pipeline shared by the HTTP API and the batch CLI:
+isolines → polygon token → FINN scrape → geocode → filter.
+
+Everything here talks only to the on-disk caches, and all of them are safe
+to share between processes: util.cache entries and the POLY_STORE token
+files are replaced atomically (scrapes also run under a FileLock), the
+geocode shelve and the quota state are only touched under their FileLocks.
+"""
+from __future__ import annotations
+import hashlib, json, time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Set
+
+import numpy as np
+import shapely
+from shapely import wkb
+from shapely.geometry import shape, MultiPolygon
+
+from config import POLY_STORE, LISTING_TTL_H
+from util import cache as c
+from util import resultset as rset
+from util.polygon import build_polylocation_param
+from util.store import ListingStore
+from finn_scraper import scrape_listings_polygon
+from geo_utils import fetch_isoline, geocode_address
+
+# ───────────────────────────────── filters ──────────────────────────────────
+def _parse_csv_list(raw: "str | Iterable[str]") -> Set[str]:
+    vals = raw.split(",") if isinstance(raw, str) else raw
+    return {str(v).strip().lower() for v in vals if str(v).strip()}
+
+@dataclass(frozen=True)
+class Filters:
+    rent_min:     int = 0
+    rent_max:     int = 9_999_999
+    size_min:     int = 0
+    size_max:     int = 0
+    bed_min:      int = 0
+    listing_mode: str = "rent"
+    types:        frozenset = field(default_factory=frozenset)
+    facilities:   frozenset = field(default_factory=frozenset)
+    floors:       frozenset = field(default_factory=frozenset)
+
+    @classmethod
+    def parse(cls, get: Callable) -> "Filters":
+        """From anything with a dict-style `.get` – query args or a batch spec."""
+        return cls(
+            rent_min=int(get("rent_min", 0) or 0),
+            rent_max=int(get("rent_max", 0) or 9_999_999),
+            size_min=int(get("size_min", 0) or 0),
+            size_max=int(get("size_max", 0) or 0),
+            bed_min=int(get("min_bedrooms", 0) or 0),
+            listing_mode=(get("mode", "rent") or "rent").lower(),
+            types=frozenset(_parse_csv_list(get("boligtype", "") or "")),
+            facilities=frozenset(_parse_csv_list(get("facilities", "") or "")),
+            floors=frozenset(_parse_csv_list(get("floor", "") or "")),
+        )
+
+    def cache_key(self, poly_param: str) -> str:
+        sig_parts: Iterable[str] = (
+            poly_param, str(self.rent_min), str(self.rent_max),
+            str(self.size_min), str(self.size_max), str(self.bed_min),
+            ",".join(sorted(self.types)), ",".join(sorted(self.facilities)),
+            ",".join(sorted(self.floors)), self.listing_mode,
+        )
+        return hashlib.sha1("|".join(sig_parts).encode()).hexdigest()
+
+# ───────────────────────────────── isolines ─────────────────────────────────
+@dataclass
+class Area:
+    token:        str
+    features:     list
+    intersection: object                       # shapely (Multi)Polygon
+    simple:       object                       # single ring sent to FINN
+    origins:      list
+
+def commute_area(locations: list[dict]) -> Area | None:
+    """
+    Fetch one isoline per work location, intersect them and stash the exact
+    intersection (+ origins) under a token.  None if no usable area is left.
+    """
+    features, origins, intersection = [], [], None
+    for idx, loc in enumerate(locations):
+        minutes = int(loc.get("time", 15))
+        mode    = loc.get("mode", "transit")
+
+        lat, lon = (
+            (loc["lat"], loc["lon"])
+            if "lat" in loc else
+            geocode_address(f'{loc.get("address","")}, Norway') or (None, None)
+        )
+        if lat is None:
+            continue
+
+        fc = fetch_isoline(lat, lon, minutes, mode)
+        if not fc.get("features"):
+            continue
+        for f in fc["features"]:
+            f.setdefault("properties", {}).update(locId=idx, mode=mode)
+
+        features.extend(fc["features"])
+        origins.append([lat, lon])
+
+        poly = shape(fc["features"][0]["geometry"])
+        intersection = poly if intersection is None else intersection.intersection(poly)
+
+    if not (features and intersection and not intersection.is_empty):
+        return None
+
+    simple = intersection.convex_hull if isinstance(intersection, MultiPolygon) else intersection
+    poly_param = build_polylocation_param(simple)
+
+    # write full precision WKB for later point-in-polygon tests
+    token = hashlib.sha1(poly_param.encode()).hexdigest()
+    c.write_atomic(POLY_STORE / f"{token}.wkb", intersection.wkb)
+    # work locations – listings sort by distance to the nearest one
+    c.write_atomic(POLY_STORE / f"{token}.json", json.dumps(origins).encode())
+    return Area(token, features, intersection, simple, origins)
+
+def load_polygon(token: str):
+    poly_fp = POLY_STORE / f"{token}.wkb"
+    return wkb.loads(poly_fp.read_bytes()) if poly_fp.exists() else None
+
+def _load_origins(token: str) -> list:
+    fp = POLY_STORE / f"{token}.json"
+    return json.loads(fp.read_text()) if fp.exists() else []
+
+# ───────────────────────────────── listings ─────────────────────────────────
+def scrape(geom, f: Filters) -> tuple[str, dict]:
+    """(cache_key, columnar ads) for *geom* – from disk or a fresh FINN scrape."""
+    poly_param = build_polylocation_param(geom)
+    cache_key  = f.cache_key(poly_param)
+    with c.with_lock(c.cache_path(cache_key)):
+        cols = c.load(cache_key, LISTING_TTL_H)
+        if cols is None:
+            rows = scrape_listings_polygon(
+                poly_param,
+                f.rent_min or None,
+                f.rent_max,
+                listing_mode=f.listing_mode,
+                property_types=f.types,
+                facilities=f.facilities,
+                floors=f.floors,
+                area_from=f.size_min or None,
+                area_to=f.size_max or None,
+                bedrooms_min=f.bed_min or None,
+            )
+            cols = ListingStore.from_rows(rows).to_columns()
+            c.save(cache_key, cols)
+    return cache_key, cols
+
+def result_set_key(token: str, cache_key: str) -> str:
+    # same token + same scrape on disk → same result set
+    mtime = c.cache_path(cache_key).stat().st_mtime_ns
+    return hashlib.sha1(f"rs|{token}|{cache_key}|{mtime}".encode()).hexdigest()
+
+def result_set(rs_key: str, token: str, geom, f: Filters,
+               cols: dict) -> tuple[ListingStore, bool]:
+    """
+    (result set, complete) for *rs_key* – cached, or filter + geocode *cols*
+    and save it.  Incomplete sets (geocode misses) are kept only briefly.
+    """
+    if (hit := rset.load(rs_key)) is not None:
+        return hit
+    inside, missed = filter_listings(ListingStore.from_columns(cols), geom, f)
+    rs = rset.build(inside, _load_origins(token))
+    rset.save(rs_key, rs, partial=bool(missed))
+    return rs, not missed
+
+def filter_listings(store: ListingStore, geom, f: Filters,
+                    ndigits: int = 5) -> tuple[ListingStore, int]:
+    """
+    Price/size mask, geocode each distinct address once, keep what's inside.
+    Also returns how many distinct addresses failed to geocode.
+    """
+    t0 = time.perf_counter()
+    sub = store.take(store.mask(price_min=f.rent_min, price_max=f.rent_max,
+                                size_min=f.size_min, size_max=f.size_max))
+
+    # geocode once per distinct address, then scatter back through the codes
+    codes, table = sub.cat["address"]
+    lat, lon = np.full(len(table), np.nan), np.full(len(table), np.nan)
+    missed = 0
+    for code in np.unique(codes).tolist():
+        if (coords := geocode_address(f"{table[code]}, Norway")):
+            lat[code], lon[code] = coords
+        else:
+            missed += 1
+    lat, lon = lat[codes], lon[codes]
+
+    shapely.prepare(geom)
+    located = ~np.isnan(lat)
+    located[located] = shapely.contains_xy(geom, lon[located], lat[located])
+    sub.num["lat"] = lat.round(ndigits)
+    sub.num["lon"] = lon.round(ndigits)
+    inside = sub.take(located)
+
+    print(f"[Filter] inside={len(inside)}  missed={missed}  "
+          f"{time.perf_counter()-t0:0.1f}s")
+    return inside, missed
@@ -28,10 +28,17 @@ def _purge_old_cache() -> None:
             fp.unlink(missing_ok=True)
 
 # ───────────────────────────────── public api ───────────────────────────────
+def write_atomic(path: Path, data: bytes) -> None:
+    """Replace *path* with *data* in one rename – readers never see half a file."""
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent))
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
 def cache_path(key: str) -> Path:
     return CACHE_DIR / f"{key}.json"
 
-def load(key: str, max_age_h: int) -> list[dict] | None:
+def load(key: str, max_age_h: int) -> Any | None:
     fn = cache_path(key)
     if not fn.exists():
         return None
@@ -41,7 +48,7 @@ def load(key: str, max_age_h: int) -> list[dict] | None:
         return meta["raw"]
     return None
 
-def save(key: str, raw: list[dict]) -> None:
+def save(key: str, raw: Any) -> None:
     fn = cache_path(key)
     payload = {"ts": _dt.datetime.utcnow().isoformat(), "raw": raw}
     _atomic_write(fn, payload)
@@ -0,0 +1,134 @@
+"""
+Response helpers – coordinate quantization, polyline geometry encoding,
+client-negotiated compression and strong ETags.
+"""
+from __future__ import annotations
+import gzip, hashlib, json
+from typing import Any, Iterable, Sequence
+from flask import Response, request
+
+try:                                             # optional – gzip always works
+    import brotli
+except ImportError:                              # pragma: no cover
+    brotli = None
+
+#: bodies smaller than this are sent as-is, compression would not pay off
+MIN_COMPRESS_BYTES = 1024
+#: 5 decimals ≈ 1 m – far below what the map can show
+DEFAULT_PRECISION  = 5
+MAX_PRECISION      = 7
+GEOMETRY_ENCODINGS = ("geojson", "polyline")
+
+# ───────────────────────────────── geometry ─────────────────────────────────
+def parse_precision(raw: Any) -> int:
+    """Client-supplied decimals, clamped to 0…MAX_PRECISION; ValueError if not an int."""
+    if raw is None:
+        return DEFAULT_PRECISION
+    if isinstance(raw, bool) or isinstance(raw, float) and not raw.is_integer():
+        raise ValueError("precision must be an integer")
+    return max(0, min(int(raw), MAX_PRECISION))
+
+def quantize_coords(coords: Any, ndigits: int) -> Any:
+    """Round a (nested) GeoJSON coordinate array to *ndigits* decimals."""
+    if coords and isinstance(coords[0], (int, float)):
+        return [round(v, ndigits) for v in coords]
+    return [quantize_coords(c, ndigits) for c in coords]
+
+def _encode_value(v: int) -> str:
+    v = ~(v << 1) if v < 0 else v << 1
+    out = []
+    while v >= 0x20:
+        out.append(chr((0x20 | (v & 0x1F)) + 63))
+        v >>= 5
+    out.append(chr(v + 63))
+    return "".join(out)
+
+def encode_polyline(ring: Iterable[Sequence[float]],
+                    precision: int = DEFAULT_PRECISION) -> str:
+    """Google encoded-polyline for a `[lon, lat]` ring (emitted lat, lon)."""
+    factor, prev_lat, prev_lon, out = 10 ** precision, 0, 0, []
+    for lon, lat, *_ in ring:
+        lat_i, lon_i = round(lat * factor), round(lon * factor)
+        out.append(_encode_value(lat_i - prev_lat))
+        out.append(_encode_value(lon_i - prev_lon))
+        prev_lat, prev_lon = lat_i, lon_i
+    return "".join(out)
+
+def compact_geometry(geom: dict, precision: int = DEFAULT_PRECISION,
+                     encoding: str = "geojson") -> dict:
+    """
+    Shrink a GeoJSON geometry.  `encoding="polyline"` swaps every ring for an
+    encoded polyline string (Polygon / MultiPolygon only), anything else just
+    quantizes the coordinates.
+    """
+    gtype = geom.get("type")
+    if encoding == "polyline" and gtype in ("Polygon", "MultiPolygon"):
+        enc = lambda rings: [encode_polyline(r, precision) for r in rings]
+        coords = (enc(geom["coordinates"]) if gtype == "Polygon"
+                  else [enc(p) for p in geom["coordinates"]])
+        return {"type": gtype, "encoding": "polyline",
+                "precision": precision, "coordinates": coords}
+    if "coordinates" not in geom:
+        return geom
+    return {**geom, "coordinates": quantize_coords(geom["coordinates"], precision)}
+
+def compact_features(features: list[dict], precision: int = DEFAULT_PRECISION,
+                     encoding: str = "geojson") -> list[dict]:
+    return [
+        {**f, "geometry": compact_geometry(f["geometry"], precision, encoding)}
+        if f.get("geometry") else f
+        for f in features
+    ]
+
+# ───────────────────────────────── responses ────────────────────────────────
+def make_etag(*parts: Any) -> str:
+    return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+
+def _negotiate_encoding() -> str | None:
+    offers = ["br", "gzip"] if brotli else ["gzip"]
+    return request.accept_encodings.best_match(offers)
+
+def _variant_etag(etag: str, enc: str | None) -> str:
+    # strong ETags must differ per content-coding
+    return f"{etag}-{enc}" if enc else etag
+
+def not_modified(etag: str) -> Response | None:
+    """
+    Return a ready `304` when the client already holds *etag*, else None.
+    Call this early – before any expensive work – whenever the ETag is known.
+    """
+    full = _variant_etag(etag, _negotiate_encoding())
+    if not request.if_none_match.contains(full):
+        return None
+    resp = Response(status=304)
+    resp.set_etag(full)
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+def json_response(payload: Any, status: int = 200, *,
+                  etag: str | None = None) -> Response:
+    """
+    Compact JSON response, compressed with whatever the client accepts and
+    tagged with a strong ETag (suffixed per content-coding) when given one.
+    """
+    if etag and (resp := not_modified(etag)):
+        return resp
+
+    body = json.dumps(payload, separators=(",", ":"),
+                      ensure_ascii=False).encode("utf-8")
+    accepted = _negotiate_encoding()
+    enc = accepted if len(body) >= MIN_COMPRESS_BYTES else None
+    if enc == "br":
+        body = brotli.compress(body, quality=5)
+    elif enc == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+
+    resp = Response(body, status=status, mimetype="application/json")
+    if enc:
+        resp.headers["Content-Encoding"] = enc
+    resp.vary.add("Accept-Encoding")
+    if etag:
+        resp.set_etag(_variant_etag(etag, accepted))
+        resp.headers["Cache-Control"] = "no-cache"   # cache, but revalidate
+    return resp
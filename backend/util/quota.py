@@ -0,0 +1,121 @@
+"""
+Geoapify quota & cost manager.
+
+Every upstream call books its credits through `acquire()` first, which
+refuses (QuotaExceeded) while the circuit breaker is open or when the call
+would overrun the budget for the rolling window.  `report()` feeds the HTTP
+status back: 403/429 open the breaker with an exponential cool-down, the
+next success after a cool-down closes it again.  State is one small file
+behind a FileLock so all gunicorn workers share the same budget; spend is
+kept in fixed-width buckets per endpoint, so it never grows with traffic.
+"""
+from __future__ import annotations
+import json, time
+from filelock import FileLock, Timeout
+
+from config import (QUOTA_FILE, QUOTA_WINDOW_H, GEOAPIFY_BUDGET, GEOAPIFY_CREDITS,
+                    BREAKER_COOLDOWN_S, BREAKER_MAX_COOLDOWN_S)
+from util import cache as c
+
+_LOCK = FileLock(str(QUOTA_FILE) + ".lock", timeout=10)
+#: while half-open only one probe goes out; others wait this long
+_PROBE_S  = 30
+#: spend bucket width – the window is accurate to this many seconds
+_BUCKET_S = 300
+
+class QuotaExceeded(RuntimeError):
+    """Upstream must not be called right now – degrade instead."""
+
+# ───────────────────────────────── state ────────────────────────────────────
+def _read(now: float) -> dict:
+    try:
+        st = json.loads(QUOTA_FILE.read_text())
+    except (OSError, ValueError):
+        st = {}
+    spend = st.get("spend")
+    st["spend"] = spend if isinstance(spend, dict) else {}   # {endpoint: {bucket: credits}}
+    st.setdefault("open_until", 0.0)
+    st.setdefault("trips", 0)
+    cutoff = (now - QUOTA_WINDOW_H * 3600) // _BUCKET_S
+    for ep, buckets in st["spend"].items():
+        st["spend"][ep] = {b: n for b, n in buckets.items() if int(b) > cutoff}
+    return st
+
+def _spent(st: dict) -> dict[str, int]:
+    return {ep: sum(b.values()) for ep, b in st["spend"].items()}
+
+def _write(st: dict) -> None:
+    c.write_atomic(QUOTA_FILE, json.dumps(st).encode())
+
+# ───────────────────────────────── public api ───────────────────────────────
+def acquire(endpoint: str) -> None:
+    """Book the credits for one *endpoint* call or raise QuotaExceeded."""
+    cost = GEOAPIFY_CREDITS.get(endpoint, 1)
+    try:
+        _LOCK.acquire()
+    except Timeout as exc:
+        raise QuotaExceeded("quota state busy") from exc
+    try:
+        now = time.time()
+        st  = _read(now)
+        if st["open_until"] > now:
+            raise QuotaExceeded(
+                f"breaker open for another {st['open_until'] - now:.0f}s")
+        spent = sum(_spent(st).values())
+        if spent + cost > GEOAPIFY_BUDGET:
+            raise QuotaExceeded(f"budget spent ({spent}/{GEOAPIFY_BUDGET})")
+        if st["trips"]:                         # half-open → single probe
+            st["open_until"] = now + _PROBE_S
+        buckets = st["spend"].setdefault(endpoint, {})
+        bucket  = str(int(now // _BUCKET_S))
+        buckets[bucket] = buckets.get(bucket, 0) + cost
+        _write(st)
+    finally:
+        _LOCK.release()
+
+def report(endpoint: str, status: int, retry_after: str | None = None) -> None:
+    """Feed an upstream HTTP status back into the breaker."""
+    if status not in (403, 429) and status >= 500:
+        return                                  # upstream hiccup, not quota
+    try:
+        _LOCK.acquire()
+    except Timeout:
+        print(f"[Quota] {endpoint} HTTP {status} – state busy, not recorded")
+        return
+    try:
+        now = time.time()
+        st  = _read(now)
+        if status in (403, 429):
+            st["trips"] += 1
+            cool = min(BREAKER_COOLDOWN_S * 2 ** (st["trips"] - 1),
+                       BREAKER_MAX_COOLDOWN_S)
+            if retry_after and retry_after.isdigit():
+                cool = max(cool, int(retry_after))
+            st["open_until"] = now + cool
+            print(f"[Quota] {endpoint} HTTP {status} – breaker open {cool}s")
+        elif st["trips"]:
+            st["trips"], st["open_until"] = 0, 0.0
+            print(f"[Quota] {endpoint} recovered – breaker closed")
+        else:
+            return
+        _write(st)
+    finally:
+        _LOCK.release()
+
+def usage() -> dict:
+    """
+    Credits spent per endpoint in the current window plus breaker state.
+    Raises QuotaExceeded when the state lock can't be had in time.
+    """
+    try:
+        with _LOCK:
+            now = time.time()
+            st  = _read(now)
+    except Timeout as exc:
+        raise QuotaExceeded("quota state busy") from exc
+    return {
+        "spent":          _spent(st),
+        "budget":         GEOAPIFY_BUDGET,
+        "window_h":       QUOTA_WINDOW_H,
+        "breaker_open_s": max(0, round(st["open_until"] - now)),
+    }
@@ -0,0 +1,146 @@
+"""
+Server-side listing result sets – filtered once, sorted & served in pages.
+
+A result set is immutable once saved (its key embeds the polygon token, the
+listing cache_key and the scrape's mtime), so cursors are just offsets into
+a sort order and stay valid until the set expires from disk.  Rows are kept
+in a columnar ListingStore; each sort order is argsorted once per set and
+memoized on the store, so follow-up pages only slice.
+"""
+from __future__ import annotations
+import base64, json, re
+from collections import OrderedDict
+from typing import Sequence
+
+import numpy as np
+
+from config import LISTING_TTL_H, PARTIAL_RS_TTL_H
+from geo_utils import haversine_km
+from util import cache as c
+from util.store import ListingStore
+
+#: sort key → store column
+SORT_KEYS = {
+    "price":    "price",
+    "size":     "size",
+    "ppm2":     "ppm2",
+    "distance": "dist_km",
+}
+MARKER_FIELDS = ("id", "lat", "lon", "price")
+VIEWS         = ("full", "markers")
+MAX_PAGE      = 500
+#: result-set keys are sha1 hex digests – anything else never came from us
+_KEY_RX       = re.compile(r"[0-9a-f]{40}")
+#: tag on saved sets so other util.cache entries never load as one
+_KIND         = "rs"
+
+#: recently used sets stay parsed in memory – paging must not re-read JSON
+_MEMO: "OrderedDict[str, ListingStore]" = OrderedDict()
+_MEMO_SIZE = 32
+
+# ───────────────────────────────── build ────────────────────────────────────
+def build(store: ListingStore, origins: Sequence[Sequence[float]] = ()) -> ListingStore:
+    """Add price-per-m² and distance-to-nearest-origin columns to *store*."""
+    price, size = store.num["price"], store.num["size"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ppm2 = np.where(size > 0, np.round(price / size), np.nan)
+
+    dist = np.full(len(store), np.nan)
+    if origins and len(store):
+        lat, lon = store.num["lat"], store.num["lon"]
+        dist = np.min([haversine_km(lat, lon, olat, olon) for olat, olon in origins],
+                      axis=0).round(2)
+
+    store.num.update(ppm2=ppm2, dist_km=dist)
+    return store
+
+# ───────────────────────────────── storage ──────────────────────────────────
+def save(rs_key: str, store: ListingStore, partial: bool = False) -> None:
+    """
+    Persist *store*.  A *partial* set (some addresses failed to geocode) only
+    lives PARTIAL_RS_TTL_H and is never memoized, so the geocodes get retried.
+    """
+    c.save(rs_key, {**store.to_columns(), "kind": _KIND, "partial": partial})
+    if not partial:
+        _remember(rs_key, store)
+
+def load(rs_key: str) -> tuple[ListingStore, bool] | None:
+    """(store, complete) for *rs_key*, or None once expired / never saved."""
+    if rs_key in _MEMO:
+        _MEMO.move_to_end(rs_key)
+        return _MEMO[rs_key], True
+    if not _KEY_RX.fullmatch(rs_key):
+        return None
+    cols = c.load(rs_key, LISTING_TTL_H)
+    if not isinstance(cols, dict) or cols.get("kind") != _KIND:
+        return None                       # expired, or some other cache entry
+    if cols.get("partial"):
+        cols = c.load(rs_key, PARTIAL_RS_TTL_H)
+        return (ListingStore.from_columns(cols), False) if cols is not None else None
+    store = ListingStore.from_columns(cols)
+    _remember(rs_key, store)
+    return store, True
+
+def _remember(rs_key: str, store: ListingStore) -> None:
+    _MEMO[rs_key] = store
+    _MEMO.move_to_end(rs_key)
+    while len(_MEMO) > _MEMO_SIZE:
+        _MEMO.popitem(last=False)
+
+# ───────────────────────────────── cursors ──────────────────────────────────
+def encode_cursor(rs_key: str, sort: str | None, desc: bool,
+                  offset: int, limit: int, view: str) -> str:
+    raw = json.dumps([rs_key, sort, int(desc), offset, limit, view],
+                     separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[str, str | None, bool, int, int, str]:
+    """Inverse of encode_cursor – raises ValueError on anything malformed."""
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        rs_key, sort, desc, offset, limit, view = json.loads(
+            base64.urlsafe_b64decode(cursor + pad))
+        offset, limit = int(offset), int(limit)
+    except Exception as exc:
+        raise ValueError("bad cursor") from exc
+    if not isinstance(rs_key, str) or not _KEY_RX.fullmatch(rs_key):
+        raise ValueError("bad cursor")
+    if sort is not None and (not isinstance(sort, str) or sort not in SORT_KEYS):
+        raise ValueError("bad cursor")
+    if view not in VIEWS or offset < 0 or limit < 1:
+        raise ValueError("bad cursor")
+    return str(rs_key), sort, bool(desc), offset, limit, view
+
+# ───────────────────────────────── paging ───────────────────────────────────
+def ordered(store: ListingStore, sort: str | None, desc: bool = False) -> np.ndarray:
+    """Row order for *sort*; missing values go last in either direction."""
+    if sort is None:
+        return np.arange(len(store))
+    if sort not in SORT_KEYS:
+        raise ValueError(f"unknown sort key {sort!r}")
+    if (idx := store.orders.get((sort, desc))) is not None:
+        return idx
+    col   = store.num[SORT_KEYS[sort]]
+    idx   = np.argsort(col, kind="stable")            # NaN sorts last
+    n_set = int(np.count_nonzero(~np.isnan(col)))
+    if desc:
+        idx = np.concatenate([idx[:n_set][::-1], idx[n_set:]])
+    store.orders[(sort, desc)] = idx
+    return idx
+
+def project(store: ListingStore, idx: np.ndarray, view: str) -> list[dict]:
+    return store.rows(idx, MARKER_FIELDS if view == "markers" else None)
+
+def page(store: ListingStore, rs_key: str, *, sort: str | None = None,
+         desc: bool = False, offset: int = 0, limit: int = 100,
+         view: str = "full") -> dict:
+    """One page of *store* plus the cursor for the next one (None at the end)."""
+    limit = max(1, min(limit, MAX_PAGE))
+    idx   = ordered(store, sort, desc)
+    end   = offset + limit
+    return {
+        "items":       project(store, idx[offset:end], view),
+        "total":       len(idx),
+        "next_cursor": (encode_cursor(rs_key, sort, desc, end, limit, view)
+                        if end < len(idx) else None),
+    }
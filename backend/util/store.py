@@ -0,0 +1,158 @@
+"""
+Columnar in-memory listing store.
+
+FINN ads are kept as typed columns instead of lists of 7-key dicts:
+numeric fields live in float64 NumPy arrays (NaN = missing), `type` and
+`address` are dictionary-encoded (int32 codes into a table of interned
+strings) and the finnkode is the primary key.  Filters are vectorized
+masks; dicts are only materialized for the rows actually sent out.
+"""
+from __future__ import annotations
+import sys
+from dataclasses import dataclass, field
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from finn_scraper import finnkode_from_url
+
+NUM_COLS  = ("price", "size", "lat", "lon")
+CAT_COLS  = ("type", "address")
+TEXT_COLS = ("title", "url", "thumb")
+#: numeric columns that go out as ints, not floats
+INT_COLS  = {"price", "size", "ppm2"}
+#: same key order the scraper dicts had (+ id, lat, lon)
+ROW_FIELDS = ("id", "title", "address", "price", "size", "type",
+              "url", "thumb", "lat", "lon")
+
+def _intern(v: str | None) -> str | None:
+    return sys.intern(v) if isinstance(v, str) else v
+
+def _encode(values: Iterable[str | None]) -> tuple[np.ndarray, list]:
+    table, lookup, codes = [], {}, []
+    for v in values:
+        if v not in lookup:
+            lookup[v] = len(table)
+            table.append(_intern(v))
+        codes.append(lookup[v])
+    return np.asarray(codes, dtype=np.int32), table
+
+def _floats(values: Iterable) -> np.ndarray:
+    return np.asarray([np.nan if v is None else v for v in values],
+                      dtype=np.float64)
+
+@dataclass
+class ListingStore:
+    ids:  np.ndarray                                  # int64 finnkode
+    num:  dict[str, np.ndarray]                       # float64, NaN = missing
+    cat:  dict[str, tuple[np.ndarray, list]]          # codes → value table
+    text: dict[str, list]
+    #: derived row orders (see util.resultset.ordered) – never persisted
+    orders: dict = field(default_factory=dict, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ───────────────────────────── construction ─────────────────────────────
+    @classmethod
+    def from_rows(cls, rows: Sequence[dict]) -> "ListingStore":
+        """Build from scraper dicts; ads without a finnkode or seen twice are dropped."""
+        seen, keep, ids = set(), [], []
+        for r in rows:
+            code = r.get("id") or finnkode_from_url(r.get("url"))
+            if code is None or code in seen:
+                continue
+            seen.add(code)
+            keep.append(r)
+            ids.append(int(code))
+        return cls(
+            ids=np.asarray(ids, dtype=np.int64),
+            num={k: _floats(r.get(k) for r in keep) for k in NUM_COLS},
+            cat={k: _encode(r.get(k) for r in keep) for k in CAT_COLS},
+            text={k: [_intern(r.get(k)) for r in keep] for k in TEXT_COLS},
+        )
+
+    @classmethod
+    def from_columns(cls, d: dict) -> "ListingStore":
+        """Inverse of to_columns – also accepts the old list-of-dicts cache."""
+        if isinstance(d, list):
+            return cls.from_rows(d)
+        return cls(
+            ids=np.asarray(d["ids"], dtype=np.int64),
+            num={k: _floats(v) for k, v in d["num"].items()},
+            cat={k: (np.asarray(v["codes"], dtype=np.int32),
+                     [_intern(s) for s in v["values"]])
+                 for k, v in d["cat"].items()},
+            text={k: [_intern(s) for s in v] for k, v in d["text"].items()},
+        )
+
+    def to_columns(self) -> dict:
+        """JSON-able column dict (what util.cache writes to disk)."""
+        nan_none = lambda a: [None if v != v else v for v in a.tolist()]
+        return {
+            "ids":  self.ids.tolist(),
+            "num":  {k: nan_none(v) for k, v in self.num.items()},
+            "cat":  {k: {"codes": c.tolist(), "values": t}
+                     for k, (c, t) in self.cat.items()},
+            "text": self.text,
+        }
+
+    # ───────────────────────────── selection ────────────────────────────────
+    def take(self, idx: np.ndarray) -> "ListingStore":
+        """Row subset (positional indices or boolean mask); tables are shared."""
+        idx = np.asarray(idx)
+        idx = np.flatnonzero(idx) if idx.dtype == bool else idx.astype(np.intp)
+        return ListingStore(
+            ids=self.ids[idx],
+            num={k: v[idx] for k, v in self.num.items()},
+            cat={k: (c[idx], t) for k, (c, t) in self.cat.items()},
+            text={k: [v[i] for i in idx.tolist()] for k, v in self.text.items()},
+        )
+
+    def mask(self, *, price_min: int = 0, price_max: int | None = None,
+             size_min: int = 0, size_max: int = 0) -> np.ndarray:
+        """Boolean mask with the same semantics as the old per-dict loop."""
+        price = np.nan_to_num(self.num["price"], nan=0.0)
+        size  = np.nan_to_num(self.num["size"],  nan=0.0)
+        m = price >= price_min
+        if price_max is not None:
+            m &= price <= price_max
+        if size_min:
+            m &= size >= size_min
+        if size_max:
+            m &= size <= size_max
+        return m
+
+    def values(self, col: str) -> list:
+        """Decoded categorical column (one entry per row)."""
+        codes, table = self.cat[col]
+        return [table[c] for c in codes.tolist()]
+
+    # ───────────────────────────── projection ───────────────────────────────
+    def columns(self, idx: Sequence[int] | np.ndarray | None = None,
+                fields: Sequence[str] | None = None) -> dict[str, list]:
+        """Plain-Python columns for *idx* (default: all rows), only with *fields*."""
+        idx = np.arange(len(self)) if idx is None else np.asarray(idx, dtype=np.intp)
+        fields = fields or (*ROW_FIELDS,
+                            *(k for k in self.num if k not in NUM_COLS))
+        cols: dict[str, list] = {}
+        for f in fields:
+            if f == "id":
+                cols[f] = [str(v) for v in self.ids[idx].tolist()]
+            elif f in self.num:
+                cast = int if f in INT_COLS else float
+                cols[f] = [None if v != v else cast(v)
+                           for v in self.num[f][idx].tolist()]
+            elif f in self.cat:
+                codes, table = self.cat[f]
+                cols[f] = [table[c] for c in codes[idx].tolist()]
+            elif f in self.text:
+                col = self.text[f]
+                cols[f] = [col[i] for i in idx.tolist()]
+        return cols
+
+    def rows(self, idx: Sequence[int] | np.ndarray | None = None,
+             fields: Sequence[str] | None = None) -> list[dict]:
+        """Materialize dicts for *idx* (default: all rows), only with *fields*."""
+        cols = self.columns(idx, fields)
+        return [dict(zip(cols, vals)) for vals in zip(*cols.values())]